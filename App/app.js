@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 
-const WS_URL = "ws://localhost:8000/ws";
+const WS_URL = "ws://localhost:8000/ws/chat";
 
 export default function App() {
   const [messages, setMessages] = useState([]);
@@ -30,24 +30,46 @@ export default function App() {
       console.error("WebSocket error:", err);
     };
 
-    socket.onmessage = (event) => {
-      setIsTyping(false);
-
+    // Apply fn to the assistant message of the current turn (create it on first frame)
+    const updateAssistant = (fn) => {
       setMessages((prev) => {
         const lastMessage = prev[prev.length - 1];
-
-        // Streaming update
         if (lastMessage?.role === "assistant") {
-          const updated = [...prev];
-          updated[updated.length - 1].content += event.data;
-          return updated;
+          return [...prev.slice(0, -1), fn(lastMessage)];
         }
-
-        // First assistant chunk
-        return [...prev, { role: "assistant", content: event.data }];
+        return [...prev, fn({ role: "assistant", content: "" })];
       });
     };
 
+    // Every message is a JSON frame: node_started | token | draft_superseded | sources | done
+    socket.onmessage = (event) => {
+      const frame = JSON.parse(event.data);
+
+      switch (frame.type) {
+        case "token":
+          updateAssistant((msg) => ({ ...msg, content: msg.content + frame.text }));
+          break;
+        case "draft_superseded":
+          updateAssistant((msg) => ({ ...msg, content: frame.answer }));
+          break;
+        case "sources":
+          updateAssistant((msg) => ({ ...msg, sources: frame.sources }));
+          break;
+        case "done":
+          if (frame.error) console.error("Answer failed:", frame.error);
+          updateAssistant((msg) => ({
+            ...msg,
+            content: frame.error
+              ? "Sorry, something went wrong. Please try again."
+              : frame.answer,
+          }));
+          setIsTyping(false);
+          break;
+        default:
+          break; // node_started: progress only
+      }
+    };
+
     return () => socket.close();
   }, []);
 
@@ -65,7 +87,7 @@ export default function App() {
     };
 
     setMessages((prev) => [...prev, userMessage]);
-    ws.current.send(input.trim());
+    ws.current.send(JSON.stringify({ question: input.trim() }));
 
     setInput("");
     setIsTyping(true);
@@ -86,7 +108,9 @@ export default function App() {
             <ChatMessage key={index} message={msg} />
           ))}
 
-          {isTyping && <TypingIndicator />}
+          {isTyping && messages[messages.length - 1]?.role !== "assistant" && (
+            <TypingIndicator />
+          )}
           <div ref={messagesEndRef} />
         </div>
 
@@ -111,7 +135,17 @@ function ChatMessage({ message }) {
         message.role === "user" ? "user" : "assistant"
       }`}
     >
-      <div className="bubble">{message.content}</div>
+      <div className="bubble">
+        {message.content}
+        {message.sources?.length > 0 && (
+          <div className="sources">
+            Sources:{" "}
+            {message.sources
+              .map((s) => (s.page != null ? `p. ${s.page}` : s.source))
+              .join(", ")}
+          </div>
+        )}
+      </div>
     </div>
   );
 }
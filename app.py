@@ -1,39 +1,145 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from src.helper import rag_app
-app = FastAPI()
+import asyncio
+import hmac
+import json
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from src.helper import retrieval_cache
+from src.batch import DEFAULT_CONCURRENCY, BatchCache, parse_questions, run_batch
+from src.cache import hot_article_queries
+from src.frames import (
+    ANSWER_CACHE_TTL,
+    answer_cache,
+    ask_frames,
+    cached_answer,
+    etag_matches,
+    replay_frames,
+    to_sse,
+)
+
+PREFETCH_TOP_ARTICLES = int(os.getenv("PREFETCH_TOP_ARTICLES", 20))
+
+def prefetch_hot_articles():
+    queries = hot_article_queries(top_n=PREFETCH_TOP_ARTICLES)
+    loaded = retrieval_cache.prefetch(queries)
+    print(f"Prefetched retrieval results for {loaded} hot-article queries")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm the retrieval cache in the background, don't delay startup
+    prefetch = asyncio.create_task(asyncio.to_thread(prefetch_hot_articles))
+    yield
+    prefetch.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+MAX_BATCH_CONCURRENCY = 32
+# every item costs LLM + Pinecone calls, so cap what one request can ask for
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", 500))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", 1024 * 1024))
 
 @app.get('/helo')
 def hello():
     return {'messages':'hello from backend'}
 
+# shared secret for admin routes; they are disabled when it is not set
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+
+@app.post('/v1/cache/invalidate')
+def invalidate_cache(request: Request):
+    # explicit hook for re-ingests that should take effect immediately
+    if not CACHE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), CACHE_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
+    retrieval_cache.invalidate()
+    answer_cache.clear()
+    return {'invalidated': ['retrieval', 'answers']}
+
+@app.post('/v1/ask/batch')
+async def ask_batch(request: Request, concurrency: int = DEFAULT_CONCURRENCY):
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"batch body exceeds {MAX_BATCH_BYTES} bytes")
+    try:
+        items = parse_questions(body.decode("utf-8").splitlines())
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"batch has {len(items)} questions, max is {MAX_BATCH_ITEMS}")
+
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+
+    async def lines():
+        async for record in run_batch(items, concurrency=concurrency, cache=BatchCache()):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+class AskRequest(BaseModel):
+    question: str
+
+def _sse_response(frames, headers: dict) -> StreamingResponse:
+    async def events():
+        async for frame in frames:
+            yield to_sse(frame)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+async def _replay(entry: dict):
+    for frame in replay_frames(entry):
+        yield frame
+
+# Cacheable variant: fully cached answers carry an ETag and can be stored by
+# shared caches / load balancers; If-None-Match revalidates with 304.
+@app.get('/v1/ask')
+async def ask_get(question: str, request: Request):
+    question = question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="question must not be empty")
+
+    entry = cached_answer(question)
+    if entry is None:
+        return _sse_response(ask_frames(question), {"Cache-Control": "no-store"})
+
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": f"public, max-age={ANSWER_CACHE_TTL}",
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return _sse_response(_replay(entry), headers)
+
+@app.post('/v1/ask')
+async def ask(body: AskRequest):
+    question = body.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="question must not be empty")
+    # cached answers are still replayed, but POST is never conditional
+    return _sse_response(ask_frames(question), {"Cache-Control": "no-store"})
+
 @app.websocket('/ws/chat')
 async def websocket_chat(ws: WebSocket):
     await ws.accept()
     try:
         while True:
-            user_msg = await ws.receive_text()
-            if user_msg == "__STOP__":
+            # plain text question, or {"question": "..."}
+            user_msg = (await ws.receive_text()).strip()
+            try:
+                question = str(json.loads(user_msg)["question"]).strip()
+            except (ValueError, KeyError, TypeError):
+                question = user_msg
+            if not question:
                 continue
 
-            initial_state = {"question": user_msg}
-
-            async for event in rag_app.astream(
-                initial_state,
-                config={"recursion_limit": 50}
-            ):
-
-                print("EVENT:", event)  # debug first
-
-                if isinstance(event, dict):
-                    for key, value in event.items():
-                        if isinstance(value, dict) and "answer" in value:
-                            await ws.send_text(value["answer"])
-                
-
-            await ws.send_text("__END__")
+            async for frame in ask_frames(question):
+                await ws.send_text(frame.model_dump_json())
 
     except WebSocketDisconnect:
         print("Client Disconnected")
-
-
-        
\ No newline at end of file
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, Hashable, Iterable, List
+
+from src.frames import doc_sources
+
+DEFAULT_CONCURRENCY = 8
+
+
+# --------------------------------------------------
+# ------------------Shared batch cache--------------
+# --------------------------------------------------
+
+class BatchCache:
+    """Memoises node calls (retrieval, relevance) across every question in a batch.
+
+    Concurrent callers asking for the same key wait on the first caller's
+    result instead of issuing a duplicate request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[Hashable, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            fut = self._futures.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._futures[key] = fut
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                fut.set_result(compute())
+            except BaseException as e:
+                # don't cache failures, let the next caller retry
+                with self._lock:
+                    self._futures.pop(key, None)
+                fut.set_exception(e)
+        return fut.result()
+
+
+# --------------------------------------------------
+# ------------------Input parsing-------------------
+# --------------------------------------------------
+
+def parse_questions(lines: Iterable[str]) -> List[dict]:
+    """Parse JSONL lines into [{"id": ..., "question": ...}].
+
+    Each line is either an object with a "question" key (and optional "id")
+    or a bare JSON string. Blank lines are skipped.
+    """
+    items = []
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {lineno}: invalid JSON ({e.msg})")
+
+        if isinstance(obj, str):
+            obj = {"question": obj}
+        if not isinstance(obj, dict) or not str(obj.get("question", "")).strip():
+            raise ValueError(f"line {lineno}: expected an object with a non-empty 'question'")
+
+        items.append({"id": obj.get("id", lineno), "question": str(obj["question"]).strip()})
+    return items
+
+
+# --------------------------------------------------
+# ------------------Batch runner--------------------
+# --------------------------------------------------
+
+async def run_batch(
+    items: List[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    cache: BatchCache = None,
+) -> AsyncIterator[dict]:
+    """Run every item through rag_app, yielding results as they complete."""
+    # imported here so BatchCache/parse_questions don't load the models and
+    # connect to Pinecone just by importing this module
+    from src.helper import rag_app
+
+    cache = cache if cache is not None else BatchCache()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    batch_start = time.perf_counter()
+
+    async def run_one(item: dict) -> dict:
+        async with sem:
+            started = time.perf_counter()
+            record = {"id": item["id"], "question": item["question"]}
+            try:
+                result = await rag_app.ainvoke(
+                    {"question": item["question"]},
+                    config={
+                        "recursion_limit": 80,
+                        "configurable": {"batch_cache": cache},
+                    },
+                )
+                record.update({
+                    "answer": result.get("answer", ""),
+                    "need_retrieval": result.get("need_retrieval"),
+                    "issup": result.get("issup"),
+                    "isuse": result.get("isuse"),
+                    # no_answer_found / generate_direct leave context empty;
+                    # relevant_docs may still hold an earlier, rejected pass
+                    "sources": doc_sources(result.get("relevant_docs")) if result.get("context") else [],
+                })
+            except Exception:
+                # full details (API errors, endpoints, request ids) stay in
+                # the server log, clients only get a generic code
+                print(f"batch item {item['id']!r} failed:")
+                traceback.print_exc()
+                record["error"] = "internal_error"
+            finished = time.perf_counter()
+            record["timings"] = {
+                "queued_ms": round((started - batch_start) * 1000, 1),
+                "elapsed_ms": round((finished - started) * 1000, 1),
+            }
+            return record
+
+    tasks = [asyncio.create_task(run_one(item)) for item in items]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+# --------------------------------------------------
+# ------------------CLI-----------------------------
+# --------------------------------------------------
+
+async def _run_cli(args):
+    with open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin as f:
+        items = parse_questions(f)
+
+    cache = BatchCache()
+    out = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    try:
+        async for record in run_batch(items, concurrency=args.concurrency, cache=cache):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"answered {len(items)} questions "
+        f"(cache hits={cache.hits}, misses={cache.misses})",
+        file=sys.stderr,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Answer a JSONL file of questions with the Self-RAG graph."
+    )
+    parser.add_argument("input", help="JSONL file of questions ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"max questions in flight (default: {DEFAULT_CONCURRENCY})",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_run_cli(args))
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "logs/queries.jsonl")
+# the log is rotated to <path>.1 at this size, so at most 2x is kept on disk
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", 5 * 1024 * 1024))
+VERSION_CHECK_INTERVAL = float(os.getenv("INDEX_VERSION_CHECK_INTERVAL", 30))
+
+# the index both store_index.py (ingest) and src/helper.py (serving) use, so
+# the version marker is written where the caches poll it
+INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "my-index-v2")
+
+INDEX_VERSION_NAMESPACE = "__meta__"
+INDEX_VERSION_ID = "index_version"
+
+
+# --------------------------------------------------
+# ------------------Index version-------------------
+# --------------------------------------------------
+# store_index.py writes a marker record into a separate namespace of the
+# Pinecone index after every ingest, so the version travels with the index
+# itself instead of a local file. Caches built on top of the vector store
+# poll it (throttled) and drop everything when it changes.
+
+def read_index_version(index) -> Optional[str]:
+    """Current ingest version of a Pinecone index, None if it can't be read."""
+    try:
+        res = index.fetch(ids=[INDEX_VERSION_ID], namespace=INDEX_VERSION_NAMESPACE)
+    except Exception as e:
+        print(f"could not read index version: {e}")
+        return None
+    vectors = getattr(res, "vectors", None)
+    if vectors is None:
+        vectors = res.get("vectors", {})
+    record = vectors.get(INDEX_VERSION_ID)
+    if record is None:
+        return ""
+    metadata = getattr(record, "metadata", None)
+    if metadata is None:
+        metadata = record.get("metadata", {})
+    return str((metadata or {}).get("version", ""))
+
+
+def write_index_version(index, dimension: int) -> str:
+    version = str(time.time_ns())
+    index.upsert(
+        vectors=[{
+            "id": INDEX_VERSION_ID,
+            # cosine indexes reject all-zero vectors
+            "values": [1.0] + [0.0] * (dimension - 1),
+            "metadata": {"version": version},
+        }],
+        namespace=INDEX_VERSION_NAMESPACE,
+    )
+    return version
+
+
+# --------------------------------------------------
+# ------------------Query normalization-------------
+# --------------------------------------------------
+
+_LETTERED_NUMBER = re.compile(r"\b(\d+)\s*-\s*([a-z]{1,2})\b")
+
+
+def normalize_query(text: str) -> str:
+    """Case/punctuation/whitespace-insensitive form of a query.
+
+    "What does Article 89 say?" and "what does article 89 say" map to the
+    same key; "Article 25-A" becomes "article 25a".
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    # the Constitution numbers inserted articles "25-A", "63-A": keep them one
+    # token ("25a") instead of letting the hyphen split them into "25 a"
+    text = _LETTERED_NUMBER.sub(r"\1\2", text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def query_numbers(text: str) -> frozenset:
+    """Article/clause/schedule numbers in a query ("25", "25a", "89")."""
+    return frozenset(re.findall(r"\b\d+[a-z]{0,2}\b", normalize_query(text)))
+
+
+# --------------------------------------------------
+# ------------------TTL / LRU cache-----------------
+# --------------------------------------------------
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry time-to-live.
+
+    If version_fn is given the whole cache is cleared whenever it returns a
+    different value than the one the entries were stored under. It is
+    polled at most once every version_check_interval seconds, and a None
+    result (version unknown) keeps the cache as it is.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        ttl: float = 3600,
+        version_fn: Callable[[], Optional[str]] = None,
+        version_check_interval: float = VERSION_CHECK_INTERVAL,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self._version = None
+        self._next_version_check = 0.0
+        self._data: "OrderedDict[object, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_version_check:
+                return
+            self._next_version_check = now + self.version_check_interval
+
+        # may hit the network, so don't hold the lock while polling
+        version = self.version_fn()
+        if version is None:
+            return
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+
+    def get(self, key, default=None):
+        self._check_version()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        self._check_version()
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def values(self) -> list:
+        self._check_version()
+        with self._lock:
+            now = time.monotonic()
+            return [v for expires, v in self._data.values() if expires >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# --------------------------------------------------
+# ------------------Retrieval cache-----------------
+# --------------------------------------------------
+
+def _unit(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+class RetrievalCache:
+    """Caches vector store results by normalized query text and query vector.
+
+    Lookup order: exact normalized text -> nearest cached query vector with
+    cosine >= similarity and the same article/clause numbers -> vector store
+    search (by the already computed vector, so the query is embedded once).
+    The number check matters: "What does Article 25 say" and "... Article 26
+    say" embed almost identically but must not share results.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        search_fn: Callable[[List[float]], list],
+        max_size: int = 512,
+        ttl: float = 3600,
+        similarity: float = 0.97,
+        version_fn: Callable[[], Optional[str]] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.search_fn = search_fn
+        self.similarity = similarity
+        self._entries = TTLCache(max_size=max_size, ttl=ttl, version_fn=version_fn)
+
+    def get(self, query: str) -> list:
+        key = normalize_query(query)
+        hit = self._entries.get(key)
+        if hit is not None:
+            return list(hit[2])
+
+        numbers = query_numbers(query)
+        vector = self.embed_fn(query)
+        unit = _unit(vector)
+        near = self._nearest(unit, numbers)
+        if near is not None:
+            return list(near)
+
+        docs = self.search_fn(vector)
+        self._entries.set(key, (numbers, unit, docs))
+        return list(docs)
+
+    def _nearest(self, unit: np.ndarray, numbers: frozenset) -> Optional[list]:
+        candidates = [(v, docs) for n, v, docs in self._entries.values() if n == numbers]
+        if not candidates:
+            return None
+        # vectors are stored unit-normalized, so one product gives all cosines
+        scores = np.stack([v for v, _ in candidates]) @ unit
+        best = int(np.argmax(scores))
+        return candidates[best][1] if scores[best] >= self.similarity else None
+
+    def prefetch(self, queries: Iterable[str]) -> int:
+        loaded = 0
+        for q in queries:
+            try:
+                self.get(q)
+                loaded += 1
+            except Exception as e:
+                print(f"prefetch failed for {q!r}: {e}")
+        return loaded
+
+    def invalidate(self):
+        self._entries.clear()
+
+
+# --------------------------------------------------
+# ------------------Query log + hot articles--------
+# --------------------------------------------------
+
+_log_lock = threading.Lock()
+# matched against normalize_query() output, so "Art. 25-A" reads "art 25a"
+_ARTICLE = re.compile(r"\b(?:articles?|arts?\.?)\s*(\d+[a-z]{0,2})\b")
+
+
+def log_query(question: str, path: str = QUERY_LOG_PATH, max_bytes: int = QUERY_LOG_MAX_BYTES):
+    line = json.dumps({"ts": time.time(), "question": question}, ensure_ascii=False)
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"could not write query log: {e}")
+
+
+def hot_article_queries(path: str = QUERY_LOG_PATH, top_n: int = 20) -> List[str]:
+    """Retrieval queries for the top_n most-asked articles in the query log.
+
+    Reads the current log and its rotated predecessor. For each article we
+    warm both the canonical "Article N" query and the phrasing users asked
+    most often.
+    """
+    article_counts = Counter()
+    phrasings = {}
+    for log_path in (path + ".1", path):
+        try:
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        question = json.loads(line)["question"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    numbers = _ARTICLE.findall(normalize_query(question))
+                    for number in {m.upper() for m in numbers}:
+                        article_counts[number] += 1
+                        phrasings.setdefault(number, Counter())[question] += 1
+        except FileNotFoundError:
+            continue
+
+    queries = []
+    for number, _ in article_counts.most_common(top_n):
+        queries.append(f"Article {number}")
+        top_phrasing = phrasings[number].most_common(1)[0][0]
+        if normalize_query(top_phrasing) != normalize_query(queries[-1]):
+            queries.append(top_phrasing)
+    return queries
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from typing import AsyncIterator, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from src.cache import TTLCache, normalize_query
+
+RECURSION_LIMIT = 80
+
+# nodes whose LLM output is the answer the user sees; everything else
+# (judges, rewriter, span reviser) is internal and not streamed as tokens
+ANSWER_NODES = {"generate_direct", "generate_from_context"}
+
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 600))
+
+
+# --------------------------------------------------
+# ------------------Frame schema--------------------
+# --------------------------------------------------
+# Every message on /ws/chat and every SSE event on GET/POST /v1/ask is one
+# of these, serialized as JSON. A turn always ends with exactly one "done" frame;
+# if the graph fails, that frame has an empty answer and error="internal_error".
+
+class NodeStartedFrame(BaseModel):
+    type: Literal["node_started"] = "node_started"
+    node: str
+
+class TokenFrame(BaseModel):
+    type: Literal["token"] = "token"
+    node: str
+    text: str
+
+# the answer shown so far is replaced by `answer` (empty when a fresh
+# generation is about to stream new tokens)
+class DraftSupersededFrame(BaseModel):
+    type: Literal["draft_superseded"] = "draft_superseded"
+    node: str
+    answer: str
+
+class SourcesFrame(BaseModel):
+    type: Literal["sources"] = "sources"
+    sources: List[dict] = Field(default_factory=list)
+
+class DoneFrame(BaseModel):
+    type: Literal["done"] = "done"
+    answer: str
+    need_retrieval: Optional[bool] = None
+    issup: Optional[str] = None
+    isuse: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+    timings: Dict[str, Union[float, None, Dict[str, float]]] = Field(default_factory=dict)
+
+Frame = Union[NodeStartedFrame, TokenFrame, DraftSupersededFrame, SourcesFrame, DoneFrame]
+
+
+def to_sse(frame: BaseModel) -> str:
+    return f"event: {frame.type}\ndata: {frame.model_dump_json()}\n\n"
+
+
+def doc_sources(docs) -> List[dict]:
+    """source/page of each document, as reported to API clients."""
+    out = []
+    for d in docs or []:
+        meta = d.metadata or {}
+        out.append({"source": meta.get("source", "unknown"), "page": meta.get("page")})
+    return out
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check: comma-separated list, weak tags, or "*"."""
+    tags = [t.strip() for t in if_none_match.split(",") if t.strip()]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+# --------------------------------------------------
+# ------------------Answer cache--------------------
+# --------------------------------------------------
+# Only final, accepted answers are stored. Cleared with the retrieval cache
+# when the index is re-ingested.
+
+# src.helper loads the models and connects to Pinecone on import, so it is
+# only pulled in once the graph or the index is actually needed
+def _index_version():
+    from src.helper import index_version
+    return index_version()
+
+answer_cache = TTLCache(
+    max_size=int(os.getenv("ANSWER_CACHE_SIZE", 1024)),
+    ttl=ANSWER_CACHE_TTL,
+    version_fn=_index_version,
+)
+
+def cached_answer(question: str) -> Optional[dict]:
+    """{"etag", "sources", "done"} for a fully cached answer, else None."""
+    return answer_cache.get(normalize_query(question))
+
+def _store_answer(question: str, sources: List[dict], done: DoneFrame):
+    payload = {"sources": sources, "done": done.model_dump(exclude={"cached", "timings"})}
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    answer_cache.set(normalize_query(question), {"etag": f'"{digest[:32]}"', **payload})
+
+def replay_frames(entry: dict) -> List[Frame]:
+    done = DoneFrame(**entry["done"], cached=True, timings={"total_ms": 0.0})
+    frames: List[Frame] = []
+    if entry["sources"]:
+        frames.append(SourcesFrame(sources=entry["sources"]))
+    frames.append(TokenFrame(node="cache", text=done.answer))
+    frames.append(done)
+    return frames
+
+
+# --------------------------------------------------
+# ------------------Graph -> frames-----------------
+# --------------------------------------------------
+
+async def ask_frames(question: str, app=None) -> AsyncIterator[Frame]:
+    """Stream frames for one question through `app` (default: rag_app)."""
+    if app is None:
+        from src.helper import rag_app as app
+
+    entry = cached_answer(question)
+    if entry is not None:
+        for frame in replay_frames(entry):
+            yield frame
+        return
+
+    start = time.perf_counter()
+    first_token_ms = None
+    node_started: Dict[str, float] = {}
+    node_ms: Dict[str, float] = {}
+    draft = ""  # what the client is currently showing
+    final: dict = {}
+    sources: List[dict] = []
+    error = None
+
+    try:
+        async for mode, chunk in app.astream(
+            {"question": question},
+            config={"recursion_limit": RECURSION_LIMIT},
+            stream_mode=["debug", "messages", "updates"],
+        ):
+            if mode == "debug":
+                if chunk.get("type") != "task":
+                    continue
+                node = chunk["payload"]["name"]
+                node_started[node] = time.perf_counter()
+                yield NodeStartedFrame(node=node)
+                if node in ANSWER_NODES and draft:
+                    draft = ""
+                    yield DraftSupersededFrame(node=node, answer="")
+
+            elif mode == "messages":
+                message, meta = chunk
+                node = meta.get("langgraph_node")
+                text = message.content
+                if node not in ANSWER_NODES or not isinstance(text, str) or not text:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                draft += text
+                yield TokenFrame(node=node, text=text)
+
+            elif mode == "updates":
+                for node, update in chunk.items():
+                    if node in node_started:
+                        elapsed = (time.perf_counter() - node_started.pop(node)) * 1000
+                        node_ms[node] = round(node_ms.get(node, 0.0) + elapsed, 1)
+                    if not isinstance(update, dict):
+                        continue
+                    final.update(update)
+                    if "relevant_docs" in update:
+                        current = doc_sources(update["relevant_docs"])
+                    elif update.get("context") == "":
+                        # no_answer_found: the answer isn't grounded in any docs
+                        current = []
+                    else:
+                        current = sources
+                    # rewrite_question clears the docs; tell the client so
+                    # sources from a rejected pass aren't left on screen
+                    if current != sources:
+                        sources = current
+                        yield SourcesFrame(sources=sources)
+                    if "answer" in update and update["answer"] != draft:
+                        draft = update["answer"]
+                        yield DraftSupersededFrame(node=node, answer=draft)
+    except Exception:
+        # full details (API errors, endpoints, request ids) stay in the
+        # server log, clients only get a generic code
+        print("ask_frames failed:")
+        traceback.print_exc()
+        error = "internal_error"
+
+    done = DoneFrame(
+        answer="" if error else final.get("answer", draft),
+        need_retrieval=final.get("need_retrieval"),
+        issup=final.get("issup"),
+        isuse=final.get("isuse"),
+        error=error,
+        timings={
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+            "first_token_ms": first_token_ms,
+            "nodes": node_ms,
+        },
+    )
+
+    # direct answers skip IsUSE; retrieved ones must have passed it
+    if not error and done.answer and (final.get("isuse") == "useful" or final.get("need_retrieval") is False):
+        _store_answer(question, sources, done)
+
+    yield done
@@ -5,6 +5,7 @@ from src.schema import (
     IsSUPDecision,
     RelevanceDecision,
     RewriteDecision,
+    SentenceSupportDecision,
     IsUSEDecision,
 )
 from src.prompt import (
@@ -15,12 +16,15 @@ from src.prompt import (
     rag_generation_prompt,
     rewrite_for_retrieval_prompt,
     revise_prompt,
+    revise_span_prompt,
+    sentence_support_prompt,
     isuse_prompt
 
 )
 from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 from langchain_huggingface import HuggingFaceEmbeddings
 from langgraph.graph import StateGraph, START, END
 from dotenv import load_dotenv
@@ -28,6 +32,14 @@ from pinecone import Pinecone
 from langchain_pinecone import PineconeVectorStore
 import os
 from src.state import State
+from src.cache import INDEX_NAME, RetrievalCache, log_query, read_index_version
+from src.verify import (
+    SentenceSplitter,
+    SentenceVerifier,
+    checks_match,
+    run_parallel,
+    summarise_checks,
+)
 
 load_dotenv()
 
@@ -46,21 +58,53 @@ embedding = HuggingFaceEmbeddings(
 # ------------------Pinecone index -----------------
 # --------------------------------------------------
 pc = Pinecone(api_key=pinecone_api_key)
-index_name = 'my-index-v2'
+index_name = INDEX_NAME
 vc =  PineconeVectorStore.from_existing_index(
     index_name=index_name,
     embedding=embedding)
+pinecone_index = pc.Index(index_name)
+
+def index_version():
+    # bumped by store_index.py after every ingest
+    return read_index_version(pinecone_index)
 
 # --------------------------------------------------
 # ------------------Retrieval-----------------------
 # --------------------------------------------------
 retriever = vc.as_retriever(search_type='similarity',search_kwargs = {'k':4})
 
+# cache in front of the vector store: exact (normalized) query text first,
+# then near-duplicate query vectors, dropped on TTL/LRU or index re-ingest
+retrieval_cache = RetrievalCache(
+    embed_fn=embedding.embed_query,
+    search_fn=lambda vector: vc.similarity_search_by_vector(vector, **retriever.search_kwargs),
+    max_size=int(os.getenv("RETRIEVAL_CACHE_SIZE", 512)),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL", 3600)),
+    similarity=float(os.getenv("RETRIEVAL_CACHE_SIMILARITY", 0.97)),
+    version_fn=index_version,
+)
+
 # --------------------------------------------------
 # ------------------LLM-----------------------------
 # --------------------------------------------------
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 
+# --------------------------------------------------
+# ------------------Batch memoisation---------------
+# --------------------------------------------------
+# When a run is part of a batch (see src/batch.py) the caller passes a shared
+# cache in config["configurable"]["batch_cache"] so identical retrievals and
+# relevance judgments are only computed once across all questions.
+
+def _batch_cache(config: RunnableConfig):
+    return ((config or {}).get("configurable") or {}).get("batch_cache")
+
+def _memoised(config: RunnableConfig, key, compute):
+    cache = _batch_cache(config)
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(key, compute)
+
 # Nodes
 
 # --------------------------------------------------
@@ -91,23 +135,31 @@ def generate_direct(state: State):
 # ------------------Retrieve Node-------------------
 # --------------------------------------------------
 
-def retrieve(state: State):
+def retrieve(state: State, config: RunnableConfig):
     q = state.get("retrieval_query") or state["question"]
-    return {"docs": retriever.invoke(q)}
+    # feeds the hot-article prefetch; offline batches would skew it
+    if not state.get("retrieval_query") and _batch_cache(config) is None:
+        log_query(state["question"])
+    docs = _memoised(config, ("retrieve", q), lambda: retrieval_cache.get(q))
+    return {"docs": list(docs)}
 
 # -----------------------------
 # 4) Relevance filter (strict)
 # -----------------------------
 relevance_llm = llm.with_structured_output(RelevanceDecision)
 
-def is_relevant(state: State):
+def is_relevant(state: State, config: RunnableConfig):
     relevant_docs: List[Document] = []
     for doc in state.get("docs", []):
-        decision: RelevanceDecision = relevance_llm.invoke(
-            is_relevant_prompt.format_messages(
-                question=state["question"],
-                document=doc.page_content,
-            )
+        decision: RelevanceDecision = _memoised(
+            config,
+            ("is_relevant", state["question"], doc.page_content),
+            lambda: relevance_llm.invoke(
+                is_relevant_prompt.format_messages(
+                    question=state["question"],
+                    document=doc.page_content,
+                )
+            ),
         )
         if decision.is_relevant:
             relevant_docs.append(doc)
@@ -121,16 +173,46 @@ def route_after_relevance(state: State) -> Literal["generate_from_context", "no_
 
 # -----------------------------
 # 5) Generate from context
+#    every completed sentence is handed to the verifier while the
+#    rest of the answer is still streaming
 # -----------------------------
 
+sentence_support_llm = llm.with_structured_output(SentenceSupportDecision)
+
+def _sentence_verifier(state: State, context: str) -> SentenceVerifier:
+    def judge(sentence: str):
+        decision: SentenceSupportDecision = sentence_support_llm.invoke(
+            sentence_support_prompt.format_messages(
+                question=state["question"],
+                sentence=sentence,
+                context=context,
+            )
+        )
+        return decision.supported, decision.evidence
+
+    return SentenceVerifier(embedding, context, judge)
+
 def generate_from_context(state: State):
     context = "\n\n---\n\n".join([d.page_content for d in state.get("relevant_docs", [])]).strip()
     if not context:
         return {"answer": "No answer found.", "context": ""}
-    out = llm.invoke(
+
+    verifier = _sentence_verifier(state, context)
+    splitter = SentenceSplitter()
+    pending = []
+    parts = []
+    for chunk in llm.stream(
         rag_generation_prompt.format_messages(question=state["question"], context=context)
-    )
-    return {"answer": out.content, "context": context}
+    ):
+        parts.append(chunk.content)
+        pending.extend(verifier.submit(seg) for seg in splitter.feed(chunk.content))
+    pending.extend(verifier.submit(seg) for seg in splitter.flush())
+
+    return {
+        "answer": "".join(parts),
+        "context": context,
+        "sentence_checks": [f.result() for f in pending],
+    }
 
 def no_answer_found(state: State):
     return {"answer": "No answer found.", "context": ""}
@@ -142,6 +224,10 @@ def no_answer_found(state: State):
 issup_llm = llm.with_structured_output(IsSUPDecision)
 
 def is_sup(state: State):
+    # sentences were already verified during generation / span revision
+    if checks_match(state.get("sentence_checks"), state.get("answer", "")):
+        return summarise_checks(state["sentence_checks"])
+
     decision: IsSUPDecision = issup_llm.invoke(
         issup_prompt.format_messages(
             question=state["question"],
@@ -154,7 +240,11 @@ def is_sup(state: State):
 
 MAX_RETRIES = 10
 
-def route_after_issup(state: State) -> Literal["accept_answer", "revise_answer"]:
+def route_after_issup(state: State) -> Literal["accept_answer", "revise_answer", "no_answer_found"]:
+    # span revision dropped every sentence -> nothing left to verify or revise
+    if not state.get("answer", "").strip():
+        return "no_answer_found"
+
     # fully supported -> move forward to IsUSE (via "accept_answer" label)
     if state.get("issup") == "fully_supported":
         return "accept_answer"
@@ -172,6 +262,10 @@ def accept_answer(state: State):
 # Revise Answer
 
 def revise_answer(state: State):
+    checks = state.get("sentence_checks")
+    if checks_match(checks, state.get("answer", "")):
+        return revise_unsupported_spans(state, checks)
+
     out = llm.invoke(
         revise_prompt.format_messages(
             question=state["question"],
@@ -184,6 +278,44 @@ def revise_answer(state: State):
         "retries": state.get("retries", 0) + 1,  # ✅ increment
     }
 
+# Only regenerate the sentences the verifier rejected, keep the rest
+
+def revise_unsupported_spans(state: State, checks: List[dict]):
+    answer = state.get("answer", "")
+    context = state.get("context", "")
+    verifier = _sentence_verifier(state, context)
+
+    def revise(check: dict) -> dict:
+        out = llm.invoke(
+            revise_span_prompt.format_messages(
+                question=state["question"],
+                answer=answer,
+                sentence=check["text"].strip(),
+                context=context,
+            )
+        )
+        text = out.content.strip()
+        if not text:
+            return None  # nothing in context supports it -> drop the span
+        # keep the original separator so the answer reads the same around it
+        trailing = check["text"][len(check["text"].rstrip()):]
+        return verifier.check(text + trailing)
+
+    to_revise = [i for i, c in enumerate(checks) if c["verdict"] != "supported"]
+    revised = dict(zip(to_revise, run_parallel(revise, [checks[i] for i in to_revise])))
+
+    new_checks = []
+    for i, c in enumerate(checks):
+        c = revised.get(i, c)
+        if c is not None:
+            new_checks.append(c)
+
+    return {
+        "answer": "".join(c["text"] for c in new_checks),
+        "sentence_checks": new_checks,
+        "retries": state.get("retries", 0) + 1,
+    }
+
 
 # Is Use 
 
@@ -230,6 +362,7 @@ def rewrite_question(state: State):
         "docs": [],
         "relevant_docs": [],
         "context": "",
+        "sentence_checks": None,
     }
 
 
@@ -297,6 +430,7 @@ g.add_conditional_edges(
     {
         "accept_answer": "is_use",      # fully_supported (or max retries) -> go to IsUSE
         "revise_answer": "revise_answer",
+        "no_answer_found": "no_answer_found",  # every span was dropped
     },
 )
 
@@ -326,72 +460,73 @@ rag_app = g.compile()
 # # -----------------------------
 # # Run the graph
 # # -----------------------------
-initial_state = {
-    "question": "what is the constitution of pakistan",
-    "retrieval_query": "",  # ✅ important
-    "rewrite_tries": 0,                                        # ✅ important
-    "docs": [],
-    "relevant_docs": [],
-    "context": "",
-    "answer": "",
-    "issup": "",
-    "evidence": [],
-    "retries": 0,
-    "isuse": "not_useful",
-    "use_reason": "",
-}
-
-
-result = rag_app.invoke(
-    initial_state,
-    config={"recursion_limit": 80},  # allow revise → verify loops
-)
+if __name__ == "__main__":
+    initial_state = {
+        "question": "what is the constitution of pakistan",
+        "retrieval_query": "",  # ✅ important
+        "rewrite_tries": 0,                                        # ✅ important
+        "docs": [],
+        "relevant_docs": [],
+        "context": "",
+        "answer": "",
+        "issup": "",
+        "evidence": [],
+        "retries": 0,
+        "isuse": "not_useful",
+        "use_reason": "",
+    }
 
-# -----------------------------
-# Debug / inspection output (clean + complete)
-# -----------------------------
-print("\n===== RAG EXECUTION RESULT =====\n")
-
-print("Question:", initial_state.get("question"))
-print("Need Retrieval:", result.get("need_retrieval"))
-
-# If you added these counters/fields in your State:
-print("Rewrite tries (retrieval):", result.get("rewrite_tries", 0))
-print("Support revise tries:", result.get("retries", 0))
-
-print("\nRetrieval:")
-print("  Total retrieved docs:", len(result.get("docs", []) or []))
-print("  Relevant docs:", len(result.get("relevant_docs", []) or []))
-
-# Optional: show sources/pages for relevant docs
-relevant_docs = result.get("relevant_docs", []) or []
-if relevant_docs:
-    print("\nRelevant docs (source/page):")
-    for i, d in enumerate(relevant_docs, 1):
-        src = (d.metadata or {}).get("source", "unknown")
-        page = (d.metadata or {}).get("page", None)
-        title = (d.metadata or {}).get("title", "")
-        extra = f", title={title}" if title else ""
-        if page is not None:
-            print(f"  {i}. source={src}, page={page}{extra}")
-        else:
-            print(f"  {i}. source={src}{extra}")
-
-print("\nVerification (IsSUP):")
-print("  issup:", result.get("issup"))
-evidence = result.get("evidence", []) or []
-if evidence:
-    print("  evidence:")
-    for e in evidence:
-        print("   -", e)
-else:
-    print("  evidence: (none)")
-
-print("\nUsefulness (IsUSE):")
-print("  isuse:", result.get("isuse"))
-print("  reason:", result.get("use_reason", ""))
-
-print("\nFinal Answer:")
-print(result.get("answer"))
-
-print("\n===============================\n")
+
+    result = rag_app.invoke(
+        initial_state,
+        config={"recursion_limit": 80},  # allow revise → verify loops
+    )
+
+    # -----------------------------
+    # Debug / inspection output (clean + complete)
+    # -----------------------------
+    print("\n===== RAG EXECUTION RESULT =====\n")
+
+    print("Question:", initial_state.get("question"))
+    print("Need Retrieval:", result.get("need_retrieval"))
+
+    # If you added these counters/fields in your State:
+    print("Rewrite tries (retrieval):", result.get("rewrite_tries", 0))
+    print("Support revise tries:", result.get("retries", 0))
+
+    print("\nRetrieval:")
+    print("  Total retrieved docs:", len(result.get("docs", []) or []))
+    print("  Relevant docs:", len(result.get("relevant_docs", []) or []))
+
+    # Optional: show sources/pages for relevant docs
+    relevant_docs = result.get("relevant_docs", []) or []
+    if relevant_docs:
+        print("\nRelevant docs (source/page):")
+        for i, d in enumerate(relevant_docs, 1):
+            src = (d.metadata or {}).get("source", "unknown")
+            page = (d.metadata or {}).get("page", None)
+            title = (d.metadata or {}).get("title", "")
+            extra = f", title={title}" if title else ""
+            if page is not None:
+                print(f"  {i}. source={src}, page={page}{extra}")
+            else:
+                print(f"  {i}. source={src}{extra}")
+
+    print("\nVerification (IsSUP):")
+    print("  issup:", result.get("issup"))
+    evidence = result.get("evidence", []) or []
+    if evidence:
+        print("  evidence:")
+        for e in evidence:
+            print("   -", e)
+    else:
+        print("  evidence: (none)")
+
+    print("\nUsefulness (IsUSE):")
+    print("  isuse:", result.get("isuse"))
+    print("  reason:", result.get("use_reason", ""))
+
+    print("\nFinal Answer:")
+    print(result.get("answer"))
+
+    print("\n===============================\n")
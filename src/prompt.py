@@ -102,6 +102,29 @@ issup_prompt = ChatPromptTemplate.from_messages(
 )
 
 
+# single sentence is supported or not prompt (disputed sentences only)
+sentence_support_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are verifying whether ONE SENTENCE of an answer is supported by the CONTEXT.\n"
+            "Return JSON with keys: supported, evidence.\n\n"
+            "Rules:\n"
+            "- supported=true ONLY if every claim in the SENTENCE is explicitly stated in CONTEXT.\n"
+            "- Any qualitative/interpretive phrasing not present in CONTEXT means supported=false.\n"
+            "- Evidence: one short direct quote from CONTEXT, or empty if unsupported.\n"
+            "- Do not use outside knowledge."
+        ),
+        (
+            "human",
+            "Question:\n{question}\n\n"
+            "Sentence:\n{sentence}\n\n"
+            "Context:\n{context}\n"
+        ),
+    ]
+)
+
+
 # revise answer prompt
 revise_prompt = ChatPromptTemplate.from_messages(
     [
@@ -128,6 +151,32 @@ revise_prompt = ChatPromptTemplate.from_messages(
 )
 
 
+# revise a single unsupported span prompt
+revise_span_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a STRICT reviser.\n\n"
+            "You receive an ANSWER and ONE unsupported SENTENCE from it.\n"
+            "Rewrite ONLY that sentence so it is fully supported by the CONTEXT.\n\n"
+            "Rules:\n"
+            "- Use ONLY the CONTEXT; prefer direct quotes.\n"
+            "- Keep the sentence's role in the ANSWER (same point, same position).\n"
+            "- Output only the rewritten sentence, nothing else.\n"
+            "- If the CONTEXT cannot support the sentence at all, output an empty string.\n"
+            "- Do NOT say 'context', 'not mentioned', 'does not mention', 'not provided', etc.\n"
+        ),
+        (
+            "human",
+            "Question:\n{question}\n\n"
+            "Answer:\n{answer}\n\n"
+            "Unsupported sentence:\n{sentence}\n\n"
+            "CONTEXT:\n{context}"
+        ),
+    ]
+)
+
+
 # the answer is useful or not
 isuse_prompt = ChatPromptTemplate.from_messages(
     [
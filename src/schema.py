@@ -21,6 +21,17 @@ class IsSUPDecision(BaseModel):
     issup: Literal["fully_supported", "partially_supported", "no_support"]
     evidence: List[str] = Field(default_factory=list)
 
+# a single answer sentence is supported or not
+class SentenceSupportDecision(BaseModel):
+    supported: bool = Field(
+        ...,
+        description="True ONLY if the CONTEXT explicitly states the claim made in the sentence."
+    )
+    evidence: str = Field(
+        default="",
+        description="Short direct quote from CONTEXT supporting the sentence, empty if unsupported."
+    )
+
 # the answer is useful or not
 class IsUSEDecision(BaseModel):
     isuse: Literal["useful", "not_useful"]
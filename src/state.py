@@ -17,6 +17,8 @@ class State(TypedDict):
     # Post-generation verification
     issup: Literal["fully_supported", "partially_supported", "no_support"]
     evidence: List[str]
+    # per-sentence verdicts from the pipelined verifier (see src/verify.py)
+    sentence_checks: List[dict]
 
     retries: int
 
@@ -0,0 +1,265 @@
+import contextvars
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from src.cache import query_numbers
+
+# --------------------------------------------------
+# ------------------Thresholds----------------------
+# --------------------------------------------------
+# Cosine similarity between an answer sentence and its closest CONTEXT
+# sentence. Above SUPPORTED_SIM we accept locally, below UNSUPPORTED_SIM we
+# reject locally, anything in between is disputed and goes to the LLM judge.
+SUPPORTED_SIM = 0.80
+UNSUPPORTED_SIM = 0.45
+
+# Cosine similarity can't see negation or changed figures ("may not
+# promulgate" vs "may promulgate", "90 days" vs "120 days"), so a high score
+# only counts as local support when both agree with the evidence sentence.
+_NEGATION = re.compile(r"\b(?:not|no|never|nor|neither|cannot|without)\b|n't\b", re.IGNORECASE)
+
+# sentences too short to carry a claim ("Yes.", "- ") are accepted as-is
+MIN_CLAIM_CHARS = 12
+
+# Embedding scoring is quick, CPU-bound and serialized on _embed_lock anyway,
+# so it gets a small pool. LLM calls (disputed-sentence judge, span revision)
+# block on the network and get their own larger pool so they never queue in
+# front of embedding checks. Size both for the expected number of concurrent
+# answers (WebSocket users + batch concurrency).
+_embed_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VERIFY_EMBED_WORKERS", 4)),
+    thread_name_prefix="issup-embed",
+)
+_llm_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VERIFY_LLM_WORKERS", 32)),
+    thread_name_prefix="issup-llm",
+)
+_embed_lock = threading.Lock()
+
+# abbreviations that end in "." without ending the sentence ("Art. 25",
+# "No. 3", "cl. (2)", "e.g. ..."); lookbehinds must be fixed width, so one each
+ABBREVIATIONS = (
+    "Art", "art", "Arts", "arts", "cl", "Cl", "cls",
+    "para", "Para", "paras", "Sch", "sch", "Sec", "sec", "ss", "p", "pp",
+    "Ch", "ch", "Vol", "vol", "e.g", "i.e", "viz", "cf", "vs", "v",
+    "Mr", "Mrs", "Ms", "Dr", "Jr", "Sr", "St", "Hon", "Govt", "Deptt",
+)
+
+# "No."/"Nos." only when a number follows ("No. 3"), so "The answer is no."
+# still ends a sentence
+_NUMBERED = r"(?!(?<=\bNo\.)\s+\d)(?!(?<=\bNos\.)\s+\d)"
+
+# sentence end: . ! ? followed by whitespace, or any line break
+_BOUNDARY = re.compile(
+    "".join(rf"(?<!\b{re.escape(a)}\.)" for a in ABBREVIATIONS)
+    + _NUMBERED
+    + r"(?<=[.!?])\s+|\n+"
+)
+
+
+# --------------------------------------------------
+# ------------------Sentence splitting--------------
+# --------------------------------------------------
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _BOUNDARY.split(text or "") if s.strip()]
+
+
+class SentenceSplitter:
+    """Cuts a token stream into sentence segments as soon as they complete.
+
+    Segments keep their trailing whitespace so "".join(segments) is exactly
+    the streamed text, which lets the reviser splice spans back in place.
+    """
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        segments = []
+        pos = 0
+        for m in _BOUNDARY.finditer(self._buf):
+            # the whitespace run may still grow with the next token
+            if m.end() == len(self._buf):
+                break
+            segments.append(self._buf[pos:m.end()])
+            pos = m.end()
+        self._buf = self._buf[pos:]
+        return segments
+
+    def flush(self) -> List[str]:
+        rest, self._buf = self._buf, ""
+        return [rest] if rest else []
+
+
+# --------------------------------------------------
+# ------------------Embedding scoring---------------
+# --------------------------------------------------
+
+def cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def _embed_query(embedding, text: str):
+    with _embed_lock:
+        return embedding.embed_query(text)
+
+
+# embedded CONTEXT sentences, reused by every check/revision of the same
+# context. Keyed on the context text only: embedding models are pydantic
+# models and not hashable, and the process uses a single one anyway.
+CONTEXT_INDEX_SIZE = 32
+_context_indexes: "OrderedDict[str, tuple]" = OrderedDict()
+_context_lock = threading.Lock()
+
+def _context_index(embedding, context: str):
+    with _context_lock:
+        if context in _context_indexes:
+            _context_indexes.move_to_end(context)
+            return _context_indexes[context]
+
+    sentences = split_sentences(context)
+    if sentences:
+        with _embed_lock:
+            vectors = embedding.embed_documents(sentences)
+        index = (tuple(sentences), tuple(tuple(v) for v in vectors))
+    else:
+        index = ((), ())
+
+    with _context_lock:
+        _context_indexes[context] = index
+        while len(_context_indexes) > CONTEXT_INDEX_SIZE:
+            _context_indexes.popitem(last=False)
+    return index
+
+
+def _contradicts(sentence: str, evidence: str) -> bool:
+    """Cheap lexical checks for what the embedding score can't see."""
+    if not query_numbers(sentence) <= query_numbers(evidence):
+        return True
+    return bool(_NEGATION.search(sentence)) != bool(_NEGATION.search(evidence))
+
+
+# --------------------------------------------------
+# ------------------Verifier------------------------
+# --------------------------------------------------
+
+class SentenceVerifier:
+    """Checks answer sentences against CONTEXT while generation is running.
+
+    judge(sentence) -> (supported: bool, evidence: str) is only called for
+    sentences whose embedding score falls in the disputed band, or that
+    score high but differ from the evidence in numbers or negation.
+    """
+
+    def __init__(self, embedding, context: str, judge: Callable[[str], tuple]):
+        self.embedding = embedding
+        self.context = context
+        self.judge = judge
+        # embed the context in the background while the first tokens arrive
+        self._index: Future = _embed_executor.submit(_context_index, embedding, context)
+
+    def submit(self, segment: str) -> Future:
+        """Score on the embedding pool, hand disputed sentences to the LLM pool."""
+        out = Future()
+        # the judge runs on a pool thread; carry over the calling node's
+        # context so LangChain callbacks/tracing still apply to it
+        ctx = contextvars.copy_context()
+
+        def judged(f: Future):
+            try:
+                out.set_result(f.result())
+            except BaseException as e:
+                out.set_exception(e)
+
+        def scored(f: Future):
+            try:
+                result = f.result()
+            except BaseException as e:
+                out.set_exception(e)
+                return
+            if result["verdict"] == "disputed":
+                _llm_executor.submit(ctx.run, self._judge, result).add_done_callback(judged)
+            else:
+                out.set_result(result)
+
+        _embed_executor.submit(self._score, segment).add_done_callback(scored)
+        return out
+
+    def check(self, segment: str) -> dict:
+        result = self._score(segment)
+        if result["verdict"] == "disputed":
+            result = self._judge(result)
+        return result
+
+    def _score(self, segment: str) -> dict:
+        sentence = segment.strip()
+        result = {"text": segment, "verdict": "supported", "score": 1.0,
+                  "evidence": "", "judged_by": "skip"}
+        if len(sentence) < MIN_CLAIM_CHARS:
+            return result
+
+        ctx_sentences, ctx_vectors = self._index.result()
+        score, evidence = 0.0, ""
+        if ctx_vectors:
+            vec = _embed_query(self.embedding, sentence)
+            scores = [cosine(vec, v) for v in ctx_vectors]
+            best = max(range(len(scores)), key=scores.__getitem__)
+            score, evidence = scores[best], ctx_sentences[best]
+
+        result.update({"score": round(score, 4), "evidence": evidence, "judged_by": "embedding"})
+        if score < UNSUPPORTED_SIM:
+            result["verdict"] = "unsupported"
+        elif score < SUPPORTED_SIM or _contradicts(sentence, evidence):
+            result["verdict"] = "disputed"
+        return result
+
+    def _judge(self, result: dict) -> dict:
+        supported, judge_evidence = self.judge(result["text"].strip())
+        return {
+            **result,
+            "verdict": "supported" if supported else "unsupported",
+            "evidence": judge_evidence or result["evidence"],
+            "judged_by": "llm",
+        }
+
+
+def summarise_checks(checks: List[dict]) -> dict:
+    """Fold per-sentence verdicts into the graph's issup/evidence fields."""
+    supported = [c for c in checks if c["verdict"] == "supported"]
+    if checks and len(supported) == len(checks):
+        issup = "fully_supported"
+    elif supported and any(c["judged_by"] != "skip" for c in supported):
+        issup = "partially_supported"
+    else:
+        issup = "no_support"
+
+    evidence: List[str] = []
+    for c in supported:
+        if c["evidence"] and c["evidence"] not in evidence:
+            evidence.append(c["evidence"])
+    return {"issup": issup, "evidence": evidence[:3]}
+
+
+def checks_match(checks: Optional[List[dict]], answer: str) -> bool:
+    """True if the stored sentence checks describe exactly this answer."""
+    return checks is not None and "".join(c["text"] for c in checks) == (answer or "")
+
+
+def run_parallel(fn, items) -> list:
+    """Run blocking LLM work (e.g. span revisions) on the LLM pool.
+
+    Each call runs in a copy of the caller's context, so LangChain callbacks
+    and tracing of the calling node follow it onto the pool thread.
+    """
+    futures = [_llm_executor.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [f.result() for f in futures]
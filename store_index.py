@@ -4,6 +4,7 @@ from src.helper import load_pdf_files, download_embeddings, text_split, filter_t
 from pinecone import Pinecone
 from pinecone import ServerlessSpec
 from langchain_pinecone import PineconeVectorStore
+from src.cache import INDEX_NAME, write_index_version
 
 load_dotenv()
 
@@ -19,7 +20,7 @@ os.environ['PINECONE_API_KEY']=PINECONE_API_KEY
 pinecone_api_key = PINECONE_API_KEY
 pc = Pinecone(api_key=pinecone_api_key)
 print(pinecone_api_key)
-index_name='my-index-v1'
+index_name=INDEX_NAME
 if not pc.has_index(index_name):
     pc.create_index(
         dimension=384,
@@ -36,3 +37,5 @@ vc = PineconeVectorStore.from_documents(
     embedding=embedding
 )
 
+# invalidate retrieval/answer caches built on the previous index
+write_index_version(index, dimension=384)
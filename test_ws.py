@@ -1,16 +1,17 @@
 import asyncio
+import json
 import websockets
 
 async def test():
     uri = "ws://localhost:8000/ws/chat"
     async with websockets.connect(uri) as websocket:
-        await websocket.send("Power of President to promulgate Ordinances Constitution of Pakistan from the source given")
+        await websocket.send(json.dumps({"question": "Power of President to promulgate Ordinances Constitution of Pakistan from the source given"}))
         
         while True:
-            response = await websocket.recv()
-            print("Received:", response)
+            frame = json.loads(await websocket.recv())
+            print("Received:", frame)
             
-            if response == "__END__":
+            if frame["type"] == "done":
                 break
 
-asyncio.run(test())
\ No newline at end of file
+asyncio.run(test())
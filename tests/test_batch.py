@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from src.batch import BatchCache, parse_questions
+
+
+def test_parse_questions_objects_and_bare_strings():
+    lines = ['{"id": "a", "question": " What is Article 89? "}', "", '"Article 25"']
+    assert parse_questions(lines) == [
+        {"id": "a", "question": "What is Article 89?"},
+        {"id": 3, "question": "Article 25"},
+    ]
+
+
+@pytest.mark.parametrize("line, message", [
+    ("{bad", "line 1: invalid JSON"),
+    ('{"id": 1}', "line 1: expected an object"),
+    ('{"question": "  "}', "line 1: expected an object"),
+    ("[1, 2]", "line 1: expected an object"),
+])
+def test_parse_questions_errors(line, message):
+    with pytest.raises(ValueError, match=message):
+        parse_questions([line])
+
+
+def test_get_or_compute_coalesces_concurrent_calls():
+    cache = BatchCache()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "docs"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("q", compute)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["docs"] * 5
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+def test_get_or_compute_retries_after_failure():
+    cache = BatchCache()
+
+    def fail():
+        raise RuntimeError("pinecone down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("q", fail)
+    assert cache.get_or_compute("q", lambda: "docs") == "docs"
+    assert cache.get_or_compute("q", fail) == "docs"
@@ -0,0 +1,104 @@
+import os
+
+from src.cache import (
+    RetrievalCache,
+    TTLCache,
+    hot_article_queries,
+    log_query,
+    normalize_query,
+    query_numbers,
+)
+
+
+def make_cache(calls):
+    # every query embeds to the same vector, so only the number check
+    # can keep them apart
+    def search(vector):
+        calls.append(vector)
+        return [f"doc{len(calls)}"]
+
+    return RetrievalCache(lambda q: [1.0, 0.0, 0.0], search, max_size=8, ttl=60)
+
+
+def test_normalize_query():
+    assert normalize_query("What does  Article 89 say?") == "what does article 89 say"
+
+
+def test_query_numbers():
+    assert query_numbers("Article 25A and cl. (2)") == frozenset({"25a", "2"})
+
+
+def test_exact_and_near_hits_share_results():
+    calls = []
+    cache = make_cache(calls)
+    assert cache.get("What does Article 89 say?") == ["doc1"]
+    assert cache.get("what does article 89 say") == ["doc1"]
+    assert cache.get("Explain Article 89") == ["doc1"]
+    assert len(calls) == 1
+
+
+def test_different_articles_never_share_results():
+    calls = []
+    cache = make_cache(calls)
+    assert cache.get("What does Article 25 say") == ["doc1"]
+    assert cache.get("What does Article 26 say") == ["doc2"]
+    assert len(calls) == 2
+
+
+def test_version_change_clears_cache_on_next_poll():
+    versions = ["v1"]
+    cache = TTLCache(max_size=8, ttl=60, version_fn=lambda: versions[0], version_check_interval=0)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    versions[0] = "v2"
+    assert cache.get("a") is None
+
+
+def test_version_poll_is_throttled_and_unknown_keeps_entries():
+    polls = []
+
+    def version():
+        polls.append(1)
+        return None  # index unreachable
+
+    cache = TTLCache(max_size=8, ttl=60, version_fn=version, version_check_interval=3600)
+    cache.set("a", 1)
+    for _ in range(5):
+        assert cache.get("a") == 1
+    assert len(polls) == 1
+
+
+def test_query_log_rotates_and_feeds_hot_articles(tmp_path):
+    path = str(tmp_path / "queries.jsonl")
+    for q in ["Article 89 ordinance", "Article 89 ordinance", "Article 25A rights"]:
+        log_query(q, path=path, max_bytes=100)
+
+    # third write rotates the first two lines out to <path>.1
+    assert os.path.exists(path + ".1")
+    assert os.path.getsize(path) < 100
+    assert hot_article_queries(path, top_n=1) == ["Article 89", "Article 89 ordinance"]
+
+
+def test_lettered_articles_are_distinct_numbers():
+    assert normalize_query("Article 25-A") == "article 25a"
+    assert query_numbers("What does Article 25-A say") == frozenset({"25a"})
+    assert query_numbers("What does Article 25 say") == frozenset({"25"})
+    assert query_numbers("Article 63 - A") == frozenset({"63a"})
+
+
+def test_article_25a_and_25_never_share_results():
+    calls = []
+    cache = make_cache(calls)
+    assert cache.get("What does Article 25-A say") == ["doc1"]
+    assert cache.get("What does Article 25 say") == ["doc2"]
+    assert cache.get("what does article 25A say") == ["doc1"]
+
+
+def test_hot_articles_count_abbreviated_and_lettered_forms(tmp_path):
+    path = str(tmp_path / "queries.jsonl")
+    for q in ["Art. 89 ordinance", "What is Article 89?", "Article 25-A", "article 25"]:
+        log_query(q, path=path)
+
+    queries = hot_article_queries(path, top_n=3)
+    assert queries[:2] == ["Article 89", "Art. 89 ordinance"]
+    assert "Article 25A" in queries and "Article 25" in queries
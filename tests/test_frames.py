@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+from src import frames
+from src.cache import TTLCache
+from src.frames import DoneFrame, etag_matches, replay_frames
+
+
+class Doc:
+    def __init__(self, page):
+        self.page_content = f"page {page}"
+        self.metadata = {"source": "Constitution.pdf", "page": page}
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubApp:
+    """Replays a fixed list of (mode, chunk) events like rag_app.astream."""
+
+    def __init__(self, events, error=None):
+        self.events = events
+        self.error = error
+
+    async def astream(self, state, config, stream_mode):
+        for event in self.events:
+            yield event
+        if self.error:
+            raise self.error
+
+
+def task(node):
+    return "debug", {"type": "task", "payload": {"name": node}}
+
+
+def tokens(node, *texts):
+    return [("messages", (Chunk(t), {"langgraph_node": node})) for t in texts]
+
+
+@pytest.fixture(autouse=True)
+def answer_cache(monkeypatch):
+    cache = TTLCache(max_size=8, ttl=60)
+    monkeypatch.setattr(frames, "answer_cache", cache)
+    return cache
+
+
+def collect(question, app):
+    async def run():
+        return [f async for f in frames.ask_frames(question, app=app)]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc" , "y"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('"ab"', False),
+    ("", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_replay_frames():
+    entry = {
+        "etag": '"e"',
+        "sources": [{"source": "Constitution.pdf", "page": 3}],
+        "done": {"answer": "Art. 89 answer", "isuse": "useful"},
+    }
+    replayed = replay_frames(entry)
+    assert [f.type for f in replayed] == ["sources", "token", "done"]
+    assert replayed[1].text == "Art. 89 answer"
+    assert replayed[2].cached is True
+
+
+def test_ask_frames_order_and_answer_cache(answer_cache):
+    app = StubApp([
+        task("retrieve"),
+        ("updates", {"retrieve": {"docs": [Doc(3)]}}),
+        task("is_relevant"),
+        ("updates", {"is_relevant": {"relevant_docs": [Doc(3)]}}),
+        task("generate_from_context"),
+        *tokens("generate_from_context", "The President ", "may promulgate."),
+        ("updates", {"generate_from_context": {"answer": "The President may promulgate."}}),
+        task("revise_answer"),
+        *tokens("revise_answer", "internal"),
+        ("updates", {"revise_answer": {"answer": "The President may promulgate an Ordinance."}}),
+        task("is_use"),
+        ("updates", {"is_use": {"isuse": "useful"}}),
+    ])
+    out = collect("Article 89?", app)
+
+    assert [f.type for f in out] == [
+        "node_started", "node_started", "sources", "node_started", "token", "token",
+        "node_started", "draft_superseded", "node_started", "done",
+    ]
+    assert out[-1].answer == "The President may promulgate an Ordinance."
+    assert out[-1].error is None
+    assert set(out[-1].timings["nodes"]) == {"retrieve", "is_relevant", "generate_from_context",
+                                             "revise_answer", "is_use"}
+
+    # second ask is replayed from the answer cache without running the graph
+    replayed = collect("article 89", StubApp([], error=AssertionError("graph ran")))
+    assert [f.type for f in replayed] == ["sources", "token", "done"]
+    assert replayed[-1].cached is True
+
+
+def test_ask_frames_ends_with_one_done_frame_on_error(answer_cache):
+    app = StubApp(
+        [task("retrieve")],
+        error=RuntimeError("pinecone 503 for request id abc123 key sk-***"),
+    )
+    out = collect("Article 89?", app)
+
+    assert [f.type for f in out] == ["node_started", "done"]
+    assert isinstance(out[-1], DoneFrame)
+    assert out[-1].answer == ""
+    assert out[-1].error == "internal_error"
+    assert "abc123" not in out[-1].model_dump_json()
+    assert len(answer_cache) == 0
+
+
+def test_ask_frames_clears_sources_of_a_rejected_pass(answer_cache):
+    app = StubApp([
+        task("is_relevant"),
+        ("updates", {"is_relevant": {"relevant_docs": [Doc(3)]}}),
+        task("rewrite_question"),
+        ("updates", {"rewrite_question": {"relevant_docs": [], "context": ""}}),
+        task("is_relevant"),
+        ("updates", {"is_relevant": {"relevant_docs": []}}),
+        task("no_answer_found"),
+        ("updates", {"no_answer_found": {"answer": "No answer found.", "context": ""}}),
+    ])
+    out = collect("Article 89?", app)
+
+    sources = [f.sources for f in out if f.type == "sources"]
+    assert sources == [[{"source": "Constitution.pdf", "page": 3}], []]
+    assert out[-1].answer == "No answer found."
+
+
+def test_ask_frames_clears_sources_when_no_answer_found(answer_cache):
+    app = StubApp([
+        task("is_relevant"),
+        ("updates", {"is_relevant": {"relevant_docs": [Doc(3)]}}),
+        task("no_answer_found"),
+        ("updates", {"no_answer_found": {"answer": "No answer found.", "context": ""}}),
+    ])
+    out = collect("Article 89?", app)
+
+    assert [f.sources for f in out if f.type == "sources"][-1] == []
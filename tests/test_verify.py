@@ -0,0 +1,143 @@
+import contextvars
+from typing import List
+
+from pydantic import BaseModel
+
+from src.verify import (
+    SUPPORTED_SIM,
+    SentenceSplitter,
+    SentenceVerifier,
+    run_parallel,
+    split_sentences,
+)
+
+
+# pydantic model like HuggingFaceEmbeddings, so it is not hashable
+class StubEmbeddings(BaseModel):
+    vocabulary: List[str] = ["equal", "law", "president", "ordinance"]
+
+    def embed_query(self, text: str) -> List[float]:
+        text = text.lower()
+        return [float(text.count(w)) for w in self.vocabulary] + [1e-3]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+
+CONTEXT = "All citizens are equal before the law. The President may promulgate an Ordinance."
+
+
+def never_judged(sentence):
+    raise AssertionError(f"judge called for {sentence!r}")
+
+
+def test_check_with_pydantic_embeddings():
+    verifier = SentenceVerifier(StubEmbeddings(), CONTEXT, never_judged)
+    result = verifier.check("All citizens are equal before the law. ")
+    assert result["verdict"] == "supported"
+    assert result["judged_by"] == "embedding"
+    assert result["evidence"] == "All citizens are equal before the law."
+
+
+def test_submit_with_pydantic_embeddings():
+    verifier = SentenceVerifier(StubEmbeddings(), CONTEXT, never_judged)
+    result = verifier.submit("Parliament meets every Tuesday in winter. ").result()
+    assert result["verdict"] == "unsupported"
+
+
+def test_disputed_sentence_goes_to_judge():
+    calls = []
+
+    def judge(sentence):
+        calls.append(sentence)
+        return True, "quote"
+
+    verifier = SentenceVerifier(StubEmbeddings(), CONTEXT, judge)
+    result = verifier.check("The President is equal before all. ")
+    assert calls == ["The President is equal before all."]
+    assert result["judged_by"] == "llm"
+    assert result["verdict"] == "supported"
+
+
+def test_split_keeps_abbreviations_together():
+    text = "Under Art. 25 all citizens are equal, e.g. before courts. See No. 3 of cl. (2) too."
+    assert split_sentences(text) == [
+        "Under Art. 25 all citizens are equal, e.g. before courts.",
+        "See No. 3 of cl. (2) too.",
+    ]
+
+
+def test_splitter_streams_whole_sentences():
+    text = "Art. 89 lets the President promulgate. It lapses after 120 days.\n- Done"
+    splitter = SentenceSplitter()
+    segments = []
+    for i in range(0, len(text), 3):
+        segments += splitter.feed(text[i:i + 3])
+    segments += splitter.flush()
+    assert "".join(segments) == text
+    assert segments[0] == "Art. 89 lets the President promulgate. "
+
+
+def test_submit_judges_disputed_sentence():
+    verifier = SentenceVerifier(StubEmbeddings(), CONTEXT, lambda s: (False, ""))
+    result = verifier.submit("The President is equal before all. ").result()
+    assert result["judged_by"] == "llm"
+    assert result["verdict"] == "unsupported"
+
+
+ORDINANCE_CONTEXT = "The President may promulgate an Ordinance. An Ordinance lapses after 120 days."
+
+
+def ordinance_verifier(calls):
+    def judge(sentence):
+        calls.append(sentence)
+        return False, ""
+
+    embedding = StubEmbeddings(vocabulary=["president", "promulgate", "ordinance", "lapses", "days"])
+    return SentenceVerifier(embedding, ORDINANCE_CONTEXT, judge)
+
+
+def test_negated_sentence_goes_to_judge_despite_high_score():
+    calls = []
+    result = ordinance_verifier(calls).check("The President may not promulgate an Ordinance. ")
+    assert result["score"] >= SUPPORTED_SIM
+    assert calls == ["The President may not promulgate an Ordinance."]
+    assert result["verdict"] == "unsupported"
+
+
+def test_changed_number_goes_to_judge_despite_high_score():
+    calls = []
+    result = ordinance_verifier(calls).check("An Ordinance lapses after 90 days. ")
+    assert result["score"] >= SUPPORTED_SIM
+    assert calls == ["An Ordinance lapses after 90 days."]
+    assert result["verdict"] == "unsupported"
+
+
+def test_matching_number_and_polarity_stay_local():
+    calls = []
+    result = ordinance_verifier(calls).check("An Ordinance lapses after 120 days. ")
+    assert calls == []
+    assert result["judged_by"] == "embedding"
+    assert result["verdict"] == "supported"
+
+
+def test_lowercase_no_still_ends_a_sentence():
+    assert split_sentences("The answer is no. Parliament may act.") == [
+        "The answer is no.",
+        "Parliament may act.",
+    ]
+
+
+def test_llm_work_sees_callers_contextvars():
+    var = contextvars.ContextVar("node", default=None)
+    var.set("generate_from_context")
+    seen = []
+
+    def judge(sentence):
+        seen.append(var.get())
+        return True, ""
+
+    verifier = SentenceVerifier(StubEmbeddings(), CONTEXT, judge)
+    verifier.submit("The President is equal before all. ").result()
+    assert run_parallel(lambda _: var.get(), [1, 2]) == ["generate_from_context"] * 2
+    assert seen == ["generate_from_context"]